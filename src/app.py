@@ -0,0 +1,50 @@
+"""
+Long-running Safety-map server.
+
+Loads the city graph once at startup and keeps it in memory, so rating
+a node or re-rendering the map costs milliseconds instead of paying the
+full load_city warmup on every CLI invocation.
+
+Run with:
+    uvicorn app:api --app-dir src
+Set SAFETY_MAP_CITY to serve a different city (default: Tel Aviv, Israel).
+"""
+import os
+
+import networkx as nx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse
+
+from map_loader import load_city, apply_ratings, render_map_html
+from ratings_utils import save_rating, load_ratings
+
+CITY = os.environ.get("SAFETY_MAP_CITY", "Tel Aviv, Israel")
+
+api = FastAPI(title="Safety-map")
+
+# Loaded once per process; every endpoint works on this in-memory graph
+G = load_city(CITY)
+apply_ratings(G, load_ratings())
+
+
+@api.post("/rate")
+def rate(node_id: int, score: float, user: str = "anonymous"):
+    """
+    Record a rating and update the in-memory graph immediately.
+    The rating is persisted to ratings.json, but the hot path only
+    touches the graph — no reload before the next render.
+    """
+    if node_id not in G.nodes:
+        raise HTTPException(status_code=404, detail=f"Unknown node {node_id}")
+
+    save_rating(node_id, score, user=user)
+    nx.set_node_attributes(G, {node_id: score}, "safety")
+    return {"node": node_id, "safety": score}
+
+
+@api.get("/map", response_class=HTMLResponse)
+def map_page():
+    """
+    Render the interactive map for the resident graph.
+    """
+    return render_map_html(G)
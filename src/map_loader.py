@@ -1,22 +1,56 @@
 import osmnx as ox
 import folium
+import networkx as nx
+import numpy as np
+import pandas as pd
 import webbrowser
 from pathlib import Path
+from datetime import datetime, timezone
 import argparse
+import functools
+import gzip
+import hashlib
+import json
+import pickle
+import threading
+import time
+
+try:
+    import orjson  # 3-10x faster than stdlib json
+except ImportError:
+    orjson = None
 
 from ratings_utils import load_ratings  # ✅ import from utils
 
+# Cache Overpass responses locally so re-runs don't hit the API again
+ox.settings.use_cache = True
+ox.settings.cache_folder = "cache"
+# Let large cities download in fewer (bigger) Overpass sub-queries; they
+# run sequentially, so fewer round-trips means less wall-clock. 10x the
+# osmnx default of 2,500 km² — bigger queries risk Overpass memory or
+# timeout errors, so don't push this much further
+ox.settings.max_query_area_size = 25e9
+
 
+@functools.lru_cache(maxsize=4)
 def load_city(city_name="Tel Aviv, Israel"):
     """
     Download city road network from OpenStreetMap.
+    The built graph is saved to cache/{city}.graphml, so subsequent runs
+    load from disk instead of re-querying Overpass. Repeated calls for
+    the same city return the already-built graph.
     Returns a NetworkX graph object.
     """
-    G = ox.graph_from_place(city_name, network_type="drive")
+    cache_path = Path("cache") / (city_name.replace(", ", "_") + ".graphml")
+    if cache_path.exists():
+        G = ox.load_graphml(cache_path)
+    else:
+        G = ox.graph_from_place(city_name, network_type="drive")
+        cache_path.parent.mkdir(exist_ok=True)
+        ox.save_graphml(G, cache_path)
 
-    # Initialize safety scores
-    for node in G.nodes:
-        G.nodes[node]["safety"] = 0.5
+    # No safety init pass: readers default missing scores to 0.5 via
+    # G.nodes[n].get("safety", 0.5), so untouched nodes stay implicit
     return G
 
 
@@ -28,83 +62,205 @@ def update_node_safety(G, node, rating):
         G.nodes[node]["safety"] = rating
 
 
+# Ratings lose weight linearly with age and stop counting after this many days
+DECAY_DAYS = 60
+
+
+def _ts_epoch(ts):
+    """
+    Timestamp → integer epoch seconds.
+    Handles legacy ISO-8601 strings from older ratings files; those were
+    written in UTC without an offset, so treat naive values as UTC.
+    """
+    if isinstance(ts, str):
+        dt = datetime.fromisoformat(ts)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp())
+    return int(ts)
+
+
 def apply_ratings(G, ratings):
     """
     Apply aggregated ratings from ratings.json to the graph.
-    ratings is a dict {node_id: [ {user, score, timestamp}, ... ]}
+    ratings is a dict {node_id: [Rating, ...]} as returned by
+    ratings_utils.
+    All records are flattened into one DataFrame and aggregated with a
+    single groupby instead of a Python loop per node; recent ratings
+    weigh more (linear decay over DECAY_DAYS).
     """
-    from statistics import mean
+    now = int(time.time())
 
+    rows = []
     for node_id, records in ratings.items():
         try:
             node_int = int(node_id)
-            if not records:
-                continue
-            scores = [r["score"] for r in records if "score" in r]
-            if not scores:
-                continue
-            avg_rating = mean(scores)
-            update_node_safety(G, node_int, avg_rating)
+            rows.extend(
+                (node_int, r.score, _ts_epoch(r.timestamp)) for r in records
+            )
         except Exception as e:
             print(f"⚠️ Skipped node {node_id}: {e}")
 
+    if not rows:
+        return
 
-def show_interactive_map(G, filename="map.html"):
+    df = pd.DataFrame(rows, columns=["node", "score", "ts"])
+    age_days = (now - df["ts"]) // 86400
+    df["weight"] = np.maximum(0.0, 1.0 - age_days / DECAY_DAYS)
+    df["ws"] = df["score"] * df["weight"]
+
+    agg = df.groupby("node").agg(
+        ws=("ws", "sum"), weight=("weight", "sum"),
+        total=("score", "sum"), count=("score", "size"),
+    )
+    # Weighted average, or a plain average where every record is stale
+    final = np.where(agg["weight"] > 0,
+                     agg["ws"] / agg["weight"].replace(0, 1),
+                     agg["total"] / agg["count"])
+
+    updates = {n: v for n, v in zip(agg.index, final) if n in G.nodes}
+    nx.set_node_attributes(G, updates, "safety")
+
+
+def _json_dumps(obj):
     """
-    Save the graph as an interactive HTML map and open it in the browser.
+    Serialize to a JSON string, with orjson when available.
+    """
+    if orjson:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _road_coords(G):
+    """
+    Build the list of road polylines as [lat, lon] coordinate lists.
+    Roads never change between rating updates, so the result is memoized
+    on the graph itself for repeat renders in the same process, and
+    cached in cache/roads_{hash}.json across processes; only the node
+    layer has to be rebuilt when ratings change.
+    """
+    roads = G.graph.get("_road_coords")
+    if roads is not None:
+        return roads
+
+    roads_hash = hashlib.blake2b(pickle.dumps(sorted(G.edges))).hexdigest()[:16]
+    cache_path = Path("cache") / f"roads_{roads_hash}.json"
+    if cache_path.exists():
+        raw = cache_path.read_bytes()
+        roads = orjson.loads(raw) if orjson else json.loads(raw)
+        G.graph["_road_coords"] = roads
+        return roads
+
+    roads = []
+    for u, v, d in G.edges(data=True):
+        geom = d.get("geometry")
+        if geom is not None:
+            coords = [[lat, lon] for lon, lat in geom.coords]
+        else:
+            # Straight edges carry no geometry; use the endpoint nodes
+            coords = [[G.nodes[u]["y"], G.nodes[u]["x"]],
+                      [G.nodes[v]["y"], G.nodes[v]["x"]]]
+        roads.append(coords)
+
+    cache_path.parent.mkdir(exist_ok=True)
+    cache_path.write_text(_json_dumps(roads))
+    G.graph["_road_coords"] = roads
+    return roads
+
+
+def render_map_html(G):
+    """
+    Render the graph as an interactive HTML map and return the string.
     Roads are blue. Nodes are colored by safety (red=unsafe, green=safe).
     Rated nodes appear larger and have popups with details.
     """
 
-    # Convert graph to GeoDataFrames
-    nodes, edges = ox.graph_to_gdfs(G)
-    center = (nodes["y"].mean(), nodes["x"].mean())
-    m = folium.Map(location=center, zoom_start=13)
+    # Pull coordinates straight off the graph — no GeoDataFrame conversion,
+    # which would allocate a Shapely geometry per node/edge just to iterate
+    # it. Node positions never change, so memoize them for repeat renders.
+    node_ids = list(G.nodes)
+    if "_node_coords" in G.graph:
+        lats, lons = G.graph["_node_coords"]
+    else:
+        lats = np.fromiter((G.nodes[n]["y"] for n in node_ids), dtype=float, count=len(node_ids))
+        lons = np.fromiter((G.nodes[n]["x"] for n in node_ids), dtype=float, count=len(node_ids))
+        G.graph["_node_coords"] = (lats, lons)
+    center = (lats.mean(), lons.mean())
+    # prefer_canvas makes Leaflet draw all CircleMarkers on one canvas
+    # instead of one SVG element per node, which keeps big cities responsive
+    m = folium.Map(location=center, zoom_start=13, prefer_canvas=True)
 
-    # Draw roads (blue polylines)
-    for _, row in edges.iterrows():
-        coords = [(lat, lon) for lon, lat in row["geometry"].coords]
-        folium.PolyLine(coords, color="blue", weight=2, opacity=0.7).add_to(m)
+    # Roads and nodes are emitted as two preserialized JSON arrays plus a
+    # short Leaflet loop, instead of one Folium object per feature. Folium
+    # runs a Jinja template and generates a UUID for every PolyLine and
+    # CircleMarker, which dominates render time for city-sized graphs.
+    roads = _road_coords(G)
 
-    # Draw nodes with safety colors
-    for _, row in nodes.iterrows():
-        node_id = row.name
-        safety = G.nodes[node_id].get("safety", 0.5)
+    safety_arr = np.fromiter(
+        (G.nodes[n].get("safety", 0.5) for n in node_ids),
+        dtype=np.float32, count=len(node_ids),
+    )
+    nodes_arr = [
+        [nid, lat, lon, round(s, 4)]
+        for nid, lat, lon, s in zip(
+            node_ids, lats.tolist(), lons.tolist(),
+            safety_arr.astype(float).tolist(),
+        )
+    ]
 
-        # Safety → red (0.0) to green (1.0)
-        r = int((1 - safety) * 255)
-        g = int(safety * 255)
-        color = f"rgb({r},{g},0)"
+    # Plain string concat on purpose: the JS uses ${...} template
+    # literals, which would clash with an f-string. The listener defers
+    # our code until after Folium's own inline map setup has run.
+    script = (
+        "const ROADS = " + _json_dumps(roads) + ";\n"
+        "const NODES = " + _json_dumps(nodes_arr) + ";\n"
+        'document.addEventListener("DOMContentLoaded", () => {\n'
+        "const _map = " + m.get_name() + ";\n"
+        """
+        for (const coords of ROADS) {
+            L.polyline(coords, {color: "blue", weight: 2, opacity: 0.7}).addTo(_map);
+        }
+        for (const [id, lat, lon, s] of NODES) {
+            const r = Math.round((1 - s) * 255);
+            const g = Math.round(s * 255);
+            const rated = s !== 0.5;  // rated nodes are bigger and clickable
+            const marker = L.circleMarker([lat, lon], {
+                radius: rated ? 8 : 4,
+                color: `rgb(${r},${g},0)`,
+                fill: true,
+                fillOpacity: 0.8,
+            }).addTo(_map);
+            if (rated) marker.bindPopup(`Node ${id} | Safety ${s.toFixed(2)}`, {maxWidth: 200});
+        }
+        });
+        """
+    )
+    m.get_root().script.add_child(folium.Element(script))
 
-        # Rated nodes (not default) are bigger and clickable
-        if safety != 0.5:
-            radius = 8
-            popup = folium.Popup(f"Node {node_id} | Safety {safety:.2f}", max_width=200)
-        else:
-            radius = 4
-            popup = None
-
-        folium.CircleMarker(
-            location=(row["y"], row["x"]),
-            radius=radius,
-            color=color,
-            fill=True,
-            fill_opacity=0.8,
-            popup=popup
-        ).add_to(m)
+    return m.get_root().render()
+
+
+def show_interactive_map(G, filename="map.html"):
+    """
+    Save the graph as an interactive HTML map and open it in the browser.
+    """
+    html = render_map_html(G)
 
     # Ensure output folder exists
     output_dir = Path("output")
     output_dir.mkdir(exist_ok=True)
 
-    # Save HTML file
+    # Save HTML file: the plain file for the browser plus a gzip sidecar
+    # for serving over HTTP (3-5x smaller)
     filepath = output_dir / filename
     filepath = filepath.resolve()
-    m.save(filepath)
+    filepath.write_text(html)
+    with gzip.open(filepath.with_suffix(".html.gz"), "wt") as f:
+        f.write(html)
 
-    # Open in default browser
+    # Open in default browser without blocking on the OS dispatch
     file_url = filepath.as_uri()
-    webbrowser.open_new_tab(file_url)
+    threading.Thread(target=webbrowser.open_new_tab, args=(file_url,), daemon=True).start()
 
     print(f"✅ Map saved and opened: {file_url}")
 
@@ -1,6 +1,51 @@
 import json
+import time
+from itertools import groupby
 from pathlib import Path
-from datetime import datetime
+from typing import NamedTuple
+
+try:
+    import orjson  # 3-10x faster than stdlib json
+except ImportError:
+    orjson = None
+
+
+class Rating(NamedTuple):
+    """
+    One rating record held in memory. A tuple is ~4x smaller than the
+    three-key dict stored on disk, which matters for big ratings files.
+    """
+    user: str
+    score: float
+    timestamp: object  # epoch int, or ISO-8601 string in legacy files
+
+
+def _to_ratings(nodes):
+    """
+    Convert the on-disk {node: [dict, ...]} form to Rating tuples.
+    """
+    return {
+        node_key: [Rating(r["user"], r["score"], r["timestamp"]) for r in records]
+        for node_key, records in nodes.items()
+    }
+
+
+def _read_json(filepath):
+    with open(filepath, "rb") as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+
+def _write_json(filepath, data):
+    # Compact output: ratings.json is rewritten on every rating and
+    # re-read before every render, so skip pretty-printing.
+    if orjson:
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(data))
+    else:
+        with open(filepath, "w") as f:
+            json.dump(data, f)
+
 
 def save_rating(node_id, score, user="anonymous", timestamp=None, filename="ratings.json"):
     """
@@ -8,8 +53,7 @@ def save_rating(node_id, score, user="anonymous", timestamp=None, filename="rati
     """
     filepath = Path(filename)
     if filepath.exists():
-        with open(filepath, "r") as f:
-            data = json.load(f)
+        data = _read_json(filepath)
     else:
         data = {"nodes": {}}
 
@@ -18,15 +62,38 @@ def save_rating(node_id, score, user="anonymous", timestamp=None, filename="rati
         data["nodes"][node_key] = []
 
     if timestamp is None:
-        timestamp = datetime.utcnow().isoformat()
+        # Integer epoch seconds: no datetime parsing needed on read
+        timestamp = int(time.time())
 
     record = {"user": user, "score": score, "timestamp": timestamp}
     data["nodes"][node_key].append(record)
 
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+    _write_json(filepath, data)
 
-    return data["nodes"]
+    return _to_ratings(data["nodes"])
+
+def save_ratings_bulk(records, filename="ratings.json"):
+    """
+    Add many rating records in one read + one write.
+    records is an iterable of (node_id, score, user, timestamp) tuples.
+    Much faster than calling save_rating per record, which re-reads and
+    rewrites the whole file every time.
+    """
+    filepath = Path(filename)
+    if filepath.exists():
+        data = _read_json(filepath)
+    else:
+        data = {"nodes": {}}
+
+    for node_id, score, user, timestamp in records:
+        if timestamp is None:
+            timestamp = int(time.time())
+        record = {"user": user, "score": score, "timestamp": timestamp}
+        data["nodes"].setdefault(str(node_id), []).append(record)
+
+    _write_json(filepath, data)
+
+    return _to_ratings(data["nodes"])
 
 def load_ratings(filename="ratings.json"):
     """
@@ -37,7 +104,22 @@ def load_ratings(filename="ratings.json"):
         print("⚠️ No ratings.json found, using defaults.")
         return {}
 
-    with open(filepath, "r") as f:
-        data = json.load(f)
+    data = _read_json(filepath)
+    nodes = _to_ratings(data.get("nodes", {}))
+
+    # Keep only the latest record per user for each node. Timestamps sort
+    # without parsing: ISO-8601 strings are lexicographically ordered, and
+    # legacy ISO records sort before epoch-int records, which is the right
+    # order since the epoch format is newer.
+    def sort_key(r):
+        return (r.user, isinstance(r.timestamp, int), r.timestamp)
+
+    for node_key, records in nodes.items():
+        if len(records) < 2:
+            continue
+        records.sort(key=sort_key)
+        nodes[node_key] = [
+            list(group)[-1] for _, group in groupby(records, key=lambda r: r.user)
+        ]
 
-    return data.get("nodes", {})
+    return nodes
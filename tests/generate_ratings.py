@@ -1,14 +1,16 @@
 import argparse
 import random
-from datetime import datetime, timedelta
 import sys
+import time
 from pathlib import Path
 
+import numpy as np
+
 # Ensure we can import from src/
 sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
 
 from map_loader import load_city, show_interactive_map, apply_ratings
-from ratings_utils import save_rating, load_ratings
+from ratings_utils import save_ratings_bulk
 
 
 def generate_test_ratings(city, num_users, num_nodes):
@@ -26,19 +28,23 @@ def generate_test_ratings(city, num_users, num_nodes):
 
     print(f"👥 Users: {len(users)} | 🕸️ Nodes rated: {len(chosen_nodes)}")
 
-    # Generate ratings
-    for user in users:
-        for node in chosen_nodes:
-            score = round(random.uniform(0.0, 1.0), 2)
-
-            # Spread timestamps across last 60 days for realism
-            days_ago = random.randint(0, 60)
-            ts = (datetime.utcnow() - timedelta(days=days_ago)).isoformat()
-
-            save_rating(node, score, user=user, timestamp=ts)
+    # Generate all scores/timestamps as NumPy arrays in one shot instead of
+    # num_users × num_nodes Python RNG and datetime calls, then write once
+    rng = np.random.default_rng()
+    scores = rng.random((len(users), len(chosen_nodes))).round(2).tolist()
+    # Spread timestamps across last 60 days for realism
+    days_ago = rng.integers(0, 61, (len(users), len(chosen_nodes)))
+    base = int(time.time())
+    timestamps = (base - days_ago * 86400).tolist()
+
+    records = [
+        (node, scores[i][j], user, timestamps[i][j])
+        for i, user in enumerate(users)
+        for j, node in enumerate(chosen_nodes)
+    ]
+    ratings = save_ratings_bulk(records)
 
     # Apply ratings and show map
-    ratings = load_ratings()
     apply_ratings(G, ratings)
 
     safe_filename = f"{city.replace(',', '').replace(' ', '_').lower()}_test.html"